@@ -1,7 +1,15 @@
+import datetime
+import os
 import re
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import parse_qs
+
 import pandas as pd
 import dash
 from dash import html, dcc, Input, Output, dash_table
+from flask import jsonify
 import plotly.express as px
 from conexion_mysql import crear_conexion
 
@@ -9,46 +17,71 @@ from conexion_mysql import crear_conexion
 # === OBL DIGITAL DASHBOARD — GENERAL LTV (Dark Gold) ===
 # ======================================================
 
-def cargar_datos():
-    """Carga datos desde MySQL o CSV local."""
+# agrupación mensual (GENERAL LTV MENSUAL)
+DIMENSIONES = ["month", "country", "affiliate", "source", "team", "agent"]
+
+# cada cuánto se buscan filas nuevas en MySQL (segundos)
+RECARGA_SEGUNDOS = int(os.getenv("LTV_RECARGA_SEGUNDOS", "300"))
+
+# tablas limpias que sirve el dashboard (tabla -> CSV local de respaldo);
+# LTV_DATASETS="TABLA_A,TABLA_B" agrega más, con CSV <TABLA>_preview.csv
+DATASETS = {
+    "CMN_MASTER_MEX_CLEAN": "CMN_MASTER_MEX_CLEAN_preview.csv",
+    "GENERAL_LTV_CLEAN": "GENERAL_LTV_preview.csv",
+}
+for _tabla in filter(None, os.getenv("LTV_DATASETS", "").split(",")):
+    DATASETS.setdefault(_tabla.strip(), f"{_tabla.strip()}_preview.csv")
+
+DATASET_DEFAULT = os.getenv("LTV_DATASET_DEFAULT", "CMN_MASTER_MEX_CLEAN")
+if DATASET_DEFAULT not in DATASETS:
+    print(f"⚠️ LTV_DATASET_DEFAULT={DATASET_DEFAULT} no está registrado, se usa {next(iter(DATASETS))}.")
+    DATASET_DEFAULT = next(iter(DATASETS))
+
+# memoria total para los datasets cargados (MB); se expulsa el menos usado
+MEMORIA_MAX_MB = int(os.getenv("LTV_MEMORIA_MAX_MB", "512"))
+
+# valor para dimensiones que la tabla no trae (p. ej. team/agent en GENERAL_LTV_CLEAN)
+SIN_DATO = "N/A"
+
+
+def leer_sql(tabla, marca=None):
+    """
+    Lee `tabla` desde MySQL; con `marca` (columna, valor) solo trae las
+    filas posteriores al id, o desde la fecha de la marca (inclusive).
+    Devuelve None si falla la conexión.
+    """
     try:
         conexion = crear_conexion()
         if conexion:
-            print("✅ Leyendo CMN_MASTER_MEX_CLEAN desde Railway MySQL...")
-            query = "SELECT * FROM CMN_MASTER_MEX_CLEAN"
-            df = pd.read_sql(query, conexion)
+            query = f"SELECT * FROM {tabla}"
+            params = None
+            if marca is not None:
+                operador = ">=" if marca[0] == "date" else ">"
+                query += f" WHERE `{marca[0]}` {operador} %s"
+                params = (marca[1],)
+            print(f"✅ Leyendo {tabla} desde Railway MySQL... {query}")
+            df = pd.read_sql(query, conexion, params=params)
             conexion.close()
             return df
     except Exception as e:
-        print(f"⚠️ Error conectando a SQL, leyendo CSV local: {e}")
-
-    print("📁 Leyendo CMN_MASTER_MEX_CLEAN_preview.csv (local)...")
-    return pd.read_csv("CMN_MASTER_MEX_CLEAN_preview.csv", dtype=str)
-
+        print(f"⚠️ Error conectando a SQL: {e}")
+    return None
 
-# === 1️⃣ Cargar datos ===
-df = cargar_datos()
-df.columns = [c.strip().lower() for c in df.columns]
 
-# === 2️⃣ Normalizar columnas esperadas ===
-if "source" not in df.columns:
-    df["source"] = None
+def cargar_datos(tabla):
+    """
+    Carga datos desde MySQL o CSV local.
+    Devuelve (df, desde_sql) para saber si las filas vienen de MySQL.
+    """
+    df = leer_sql(tabla)
+    if df is not None:
+        return df, True
 
-# Normalizar USD
-if "usd_total" not in df.columns:
-    for alt in ["usd", "total_amount", "amount_usd"]:
-        if alt in df.columns:
-            df.rename(columns={alt: "usd_total"}, inplace=True)
-            break
+    print(f"📁 Leyendo {DATASETS[tabla]} (local)...")
+    return pd.read_csv(DATASETS[tabla], dtype=str), False
 
-# Normalizar tipo de depósito
-if "deposit_type" not in df.columns:
-    for alt in ["type", "deposit", "deposit_kind"]:
-        if alt in df.columns:
-            df.rename(columns={alt: "deposit_type"}, inplace=True)
-            break
 
-# === 3️⃣ Normalizar fechas ===
+# === Normalizar fechas ===
 def convertir_fecha(valor):
     try:
         s = str(valor).strip()
@@ -58,11 +91,8 @@ def convertir_fecha(valor):
     except:
         return pd.NaT
 
-df["date"] = df["date"].astype(str).apply(convertir_fecha)
-df = df[df["date"].notna()]
-df["date"] = pd.to_datetime(df["date"]).dt.tz_localize(None)
 
-# === 4️⃣ Limpieza de montos ===
+# === Limpieza de montos ===
 def limpiar_usd(valor):
     if pd.isna(valor):
         return 0.0
@@ -76,16 +106,312 @@ def limpiar_usd(valor):
     except:
         return 0.0
 
-df["usd_total"] = df["usd_total"].apply(limpiar_usd)
 
-# === 5️⃣ Limpieza de texto ===
-for col in ["country", "affiliate", "source", "deposit_type"]:
-    if col in df.columns:
-        df[col] = df[col].astype(str).str.strip().str.title()
-        df[col].replace({"Nan": None, "None": None, "": None}, inplace=True)
+def limpiar_datos(df):
+    """Normaliza columnas, fechas, montos y texto de un lote de filas."""
+    df = df.copy()
+    df.columns = [c.strip().lower() for c in df.columns]
+
+    # === Normalizar columnas esperadas ===
+    for col in ["source", "team", "agent"]:
+        if col not in df.columns:
+            df[col] = SIN_DATO
+
+    # Normalizar USD
+    if "usd_total" not in df.columns:
+        for alt in ["usd", "total_amount", "amount_usd"]:
+            if alt in df.columns:
+                df.rename(columns={alt: "usd_total"}, inplace=True)
+                break
+
+    # Normalizar tipo de depósito
+    if "deposit_type" not in df.columns:
+        for alt in ["type", "deposit", "deposit_kind"]:
+            if alt in df.columns:
+                df.rename(columns={alt: "deposit_type"}, inplace=True)
+                break
+
+    # === Fechas ===
+    # sin id, la marca de carga es la fecha original (puede traer hora)
+    if "id" not in df.columns:
+        df["date_raw"] = df["date"]
+    df["date"] = df["date"].astype(str).apply(convertir_fecha)
+    df = df[df["date"].notna()].copy()
+    df["date"] = pd.to_datetime(df["date"]).dt.tz_localize(None)
+
+    # === Montos ===
+    df["usd_total"] = df["usd_total"].apply(limpiar_usd)
+
+    # === Texto ===
+    for col in ["country", "affiliate", "source", "deposit_type"]:
+        if col in df.columns:
+            df[col] = df[col].astype(str).str.strip().str.title()
+            df[col] = df[col].replace({"Nan": None, "None": None, "": None})
+
+    # === FTD'S por fila ===
+    # del tipo de depósito; en tablas ya agregadas (GENERAL_LTV_CLEAN) de count_ftd,
+    # que no permiten separar USD FTD / USD RTN
+    if "deposit_type" in df.columns:
+        df["n_ftd"] = (df["deposit_type"] == "Ftd").astype(int)
+    else:
+        conteo = df["count_ftd"] if "count_ftd" in df.columns else pd.Series(0, index=df.index)
+        df["n_ftd"] = pd.to_numeric(conteo, errors="coerce").fillna(0)
+
+    return df
+
+
+def fecha_tipada(serie):
+    """True si la columna viene como DATE/DATETIME y no como texto."""
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        return True
+    valores = serie.dropna()
+    return not valores.empty and valores.map(lambda v: isinstance(v, datetime.date)).all()
+
+
+def marca_carga(df_raw, df_limpio, marca_anterior=None):
+    """
+    Última fila cargada: ("id", máximo id) si la tabla tiene id,
+    si no ("date", máxima fecha original, sin truncar al día).
+    Con fechas de texto (p. ej. dd/mm/YYYY) el máximo y el WHERE de SQL
+    serían alfabéticos, así que no hay marca y solo sirve la carga completa.
+    """
+    columnas = {c.strip().lower(): c for c in df_raw.columns}
+    if "id" in columnas:
+        ids = pd.to_numeric(df_raw[columnas["id"]], errors="coerce").dropna()
+        if not ids.empty:
+            return ("id", int(ids.max()))
+    elif "date_raw" in df_limpio.columns and not df_limpio.empty:
+        if not fecha_tipada(df_limpio["date_raw"]):
+            return None
+        ultima = df_limpio["date_raw"].max()
+        if isinstance(ultima, pd.Timestamp):
+            ultima = ultima.to_pydatetime()
+        return ("date", ultima)
+    return marca_anterior
+
+
+# === Agregados mensuales ===
+def ordenar_mensual(df_mensual):
+    return df_mensual.sort_values(
+        DIMENSIONES, na_position="last", kind="mergesort"
+    ).reset_index(drop=True)
+
+
+def agregar_mensual(df):
+    """
+    Suma por mes y dimensiones: usd_total, FTD'S, USD FTD y USD RTN.
+    Conserva los grupos con dimensiones nulas (cuentan en los KPIs).
+    Sin deposit_type, USD FTD y USD RTN quedan en NaN (no se conocen).
+    """
+    con_tipo = "deposit_type" in df.columns
+    base = df.assign(
+        month=df["date"].dt.to_period("M"),
+        es_ftd=(df["deposit_type"] == "Ftd") if con_tipo else False,
+    )
+    base["usd_ftd"] = base["usd_total"].where(base["es_ftd"], 0.0)
+    base["usd_rtn"] = base["usd_total"].where(~base["es_ftd"], 0.0)
+
+    df_mensual = base.groupby(DIMENSIONES, dropna=False, as_index=False).agg(
+        usd_total=("usd_total", "sum"),
+        count_ftd=("n_ftd", "sum"),
+        usd_ftd=("usd_ftd", "sum"),
+        usd_rtn=("usd_rtn", "sum"),
+    )
+    if not con_tipo:
+        df_mensual[["usd_ftd", "usd_rtn"]] = float("nan")
+    return ordenar_mensual(df_mensual)
+
+
+def fusionar_mensual(df_mensual, df, df_nuevo):
+    """
+    Integra un lote nuevo en los agregados: los meses que toca se
+    recalculan completos desde `df` (ya con el lote), el resto se conserva.
+    """
+    if df_nuevo.empty:
+        return df_mensual
+
+    meses = df_nuevo["date"].dt.to_period("M").unique()
+    conservado = df_mensual[~df_mensual["month"].isin(meses)]
+    recalculado = agregar_mensual(df[df["date"].dt.to_period("M").isin(meses)])
+    return ordenar_mensual(pd.concat([conservado, recalculado], ignore_index=True))
+
+
+# === 1️⃣ Registro de datasets ===
+def cargar_estado(tabla):
+    """
+    Carga y limpia una tabla completa y arma su estado (filas + agregados).
+    Si las filas vienen del CSV local no hay marca: el CSV es una foto
+    aparte y no se le mezclan filas nuevas de MySQL.
+    """
+    inicio = time.time()
+    df_raw, desde_sql = cargar_datos(tabla)
+    df = limpiar_datos(df_raw)
+    return {
+        "tabla": tabla,
+        "df": df,
+        "df_mensual": agregar_mensual(df),
+        "marca": marca_carga(df_raw, df) if desde_sql else None,
+        "ultima_revision": time.time(),
+        "segundos_carga": time.time() - inicio,
+    }
+
+
+def memoria_estado(estado):
+    return int(
+        estado["df"].memory_usage(deep=True).sum()
+        + estado["df_mensual"].memory_usage(deep=True).sum()
+    )
+
+
+def refrescar_datos(estado):
+    """
+    Agrega las filas nuevas de MySQL (posteriores a la marca) sin recargar todo.
+
+    Con marca por fecha se vuelve a leer desde la última fecha cargada
+    (inclusive) y se reemplazan en memoria las filas desde esa fecha, así no
+    se duplican ni se pierden filas agregadas después para ese mismo día.
+    Limitación: solo se ven filas nuevas; los meses históricos que el ETL
+    reescribe (particiones de GENERAL_LTV_CLEAN_DIGEST) no se releen hasta
+    que el dataset se vuelve a cargar completo.
+
+    No modifica las filas ni los agregados de `estado` (los callbacks lo leen
+    sin lock): devuelve un estado nuevo, o None si no hubo filas nuevas.
+    """
+    if estado["marca"] is None or time.time() - estado["ultima_revision"] < RECARGA_SEGUNDOS:
+        return None
+    estado["ultima_revision"] = time.time()
+
+    df_raw_nuevo = leer_sql(estado["tabla"], estado["marca"])
+    if df_raw_nuevo is None or df_raw_nuevo.empty:
+        return None
+
+    df_nuevo = limpiar_datos(df_raw_nuevo)
+    df = estado["df"]
+    reemplazadas = df.iloc[0:0]
+    if estado["marca"][0] == "date":
+        desde_marca = df["date_raw"] >= estado["marca"][1]
+        reemplazadas, df = df[desde_marca], df[~desde_marca]
+
+    df = pd.concat([df, df_nuevo], ignore_index=True)
+    nuevo = dict(
+        estado,
+        df=df,
+        df_mensual=fusionar_mensual(
+            estado["df_mensual"], df, pd.concat([reemplazadas, df_nuevo])
+        ),
+        marca=marca_carga(df_raw_nuevo, df_nuevo, estado["marca"]),
+    )
+    print(f"🔄 {nuevo['tabla']}: {len(df_nuevo)} filas nuevas integradas (marca {nuevo['marca']}).")
+    return nuevo
+
+
+class RegistroDatasets:
+    """
+    Datasets cargados bajo demanda y retenidos en orden LRU mientras la
+    memoria total no supere `memoria_max`; el dataset pedido nunca se expulsa.
+
+    La carga y el refresco de una tabla se hacen con su propio lock, fuera
+    del lock global, que solo protege `cargados`; así una carga lenta no
+    bloquea las consultas de las demás tablas.
+    """
+
+    def __init__(self, tablas, memoria_max):
+        self.tablas = list(tablas)
+        self.memoria_max = memoria_max
+        self.cargados = OrderedDict()
+        self.lock = threading.Lock()
+        self.locks_tabla = {tabla: threading.Lock() for tabla in self.tablas}
+
+    def obtener(self, tabla):
+        if tabla not in self.tablas:
+            tabla = DATASET_DEFAULT
+
+        with self.locks_tabla[tabla]:
+            with self.lock:
+                estado = self.cargados.get(tabla)
+                if estado is not None:
+                    self.cargados.move_to_end(tabla)
+
+            if estado is None:
+                estado = cargar_estado(tabla)
+                estado["bytes"] = memoria_estado(estado)
+                print(
+                    f"📦 {tabla}: {len(estado['df'])} filas, "
+                    f"{estado['segundos_carga']:.2f}s, {estado['bytes'] / 1e6:.1f} MB"
+                )
+            else:
+                refrescado = refrescar_datos(estado)
+                if refrescado is not None:
+                    refrescado["bytes"] = memoria_estado(refrescado)
+                    estado = refrescado
+
+            with self.lock:
+                self.cargados[tabla] = estado
+                self.cargados.move_to_end(tabla)
+                self._expulsar(tabla)
+            return estado
+
+    def memoria_total(self):
+        """Memoria de los datasets cargados; llamar con `self.lock` tomado."""
+        return sum(e["bytes"] for e in self.cargados.values())
+
+    def _expulsar(self, actual):
+        while self.memoria_total() > self.memoria_max and len(self.cargados) > 1:
+            tabla = next(iter(self.cargados))
+            if tabla == actual:
+                break
+            estado = self.cargados.pop(tabla)
+            print(f"♻️ {tabla} expulsado de memoria ({estado['bytes'] / 1e6:.1f} MB).")
+
+    def reporte(self):
+        with self.lock:
+            datasets = []
+            for tabla in self.tablas:
+                estado = self.cargados.get(tabla)
+                datasets.append({
+                    "tabla": tabla,
+                    "cargado": estado is not None,
+                    "filas": len(estado["df"]) if estado else None,
+                    "segundos_carga": round(estado["segundos_carga"], 3) if estado else None,
+                    "memoria_mb": round(estado["bytes"] / 1e6, 1) if estado else None,
+                })
+
+            return {
+                "memoria_max_mb": round(self.memoria_max / 1e6, 1),
+                "memoria_total_mb": round(self.memoria_total() / 1e6, 1),
+                "datasets": datasets,
+            }
+
+
+registro = RegistroDatasets(DATASETS, MEMORIA_MAX_MB * 1_000_000)
+
+
+def mensual_en_rango(estado, start, end):
+    """
+    Agregados mensuales para el rango de fechas: los meses completos salen
+    de df_mensual, los meses de borde se recalculan desde las filas.
+    """
+    df, df_mensual = estado["df"], estado["df_mensual"]
+    if not (start and end):
+        return df_mensual
+
+    inicio, fin = pd.to_datetime(start), pd.to_datetime(end)
+    meses = df_mensual["month"]
+    completos = (meses.dt.start_time >= inicio) & (meses.dt.end_time.dt.normalize() <= fin)
+
+    mes_inicio, mes_fin = inicio.to_period("M"), fin.to_period("M")
+    bordes = [m for m in {mes_inicio, mes_fin} if mes_inicio <= m <= mes_fin]
+    filas = df[
+        df["date"].dt.to_period("M").isin(bordes)
+        & (df["date"] >= inicio)
+        & (df["date"] <= fin)
+    ]
+
+    partes = [df_mensual[completos & ~meses.isin(bordes)]]
+    if not filas.empty:
+        partes.append(agregar_mensual(filas))
+    return ordenar_mensual(pd.concat(partes, ignore_index=True))
 
-# === 6️⃣ Rango de fechas ===
-fecha_min, fecha_max = df["date"].min(), df["date"].max()
 
 # === 7️⃣ Formato ===
 def formato_km(valor):
@@ -107,6 +433,12 @@ server = app.server
 app.title = "OBL Digital — GENERAL LTV Dashboard"
 
 
+@server.route("/datasets")
+def datasets_cargados():
+    """Tiempo de carga y memoria por dataset (para monitoreo)."""
+    return jsonify(registro.reporte())
+
+
 # === 9️⃣ Layout ===
 app.layout = html.Div(
     style={
@@ -117,6 +449,8 @@ app.layout = html.Div(
     },
     children=[
 
+        dcc.Location(id="url", refresh=False),
+
         html.H1("📊 DASHBOARD GENERAL LTV", style={
             "textAlign": "center",
             "color": "#D4AF37",
@@ -139,31 +473,38 @@ app.layout = html.Div(
                         "textAlign": "center",
                     },
                     children=[
-                        html.H4("Date", style={"color": "#D4AF37"}),
+                        html.H4("Dataset", style={"color": "#D4AF37"}),
+                        dcc.Dropdown(
+                            list(DATASETS),
+                            value=DATASET_DEFAULT,
+                            clearable=False,
+                            id="filtro-dataset"
+                        ),
+                        html.Div(id="info-dataset", style={"color": "#999", "fontSize": "12px", "marginTop": "6px"}),
+
+                        html.H4("Date", style={"color": "#D4AF37", "marginTop": "10px"}),
                         dcc.DatePickerRange(
                             id="filtro-fecha",
-                            start_date=fecha_min,
-                            end_date=fecha_max,
                             display_format="YYYY-MM-DD",
                         ),
 
                         html.H4("Affiliate", style={"color": "#D4AF37", "marginTop": "10px"}),
                         dcc.Dropdown(
-                            sorted(df["affiliate"].dropna().unique()),
+                            [],
                             multi=True,
                             id="filtro-affiliate"
                         ),
 
                         html.H4("Source", style={"color": "#D4AF37", "marginTop": "10px"}),
                         dcc.Dropdown(
-                            sorted(df["source"].dropna().unique()),
+                            [],
                             multi=True,
                             id="filtro-source"
                         ),
 
                         html.H4("Country", style={"color": "#D4AF37", "marginTop": "10px"}),
                         dcc.Dropdown(
-                            sorted(df["country"].dropna().unique()),
+                            [],
                             multi=True,
                             id="filtro-country"
                         ),
@@ -232,7 +573,55 @@ app.layout = html.Div(
 )
 
 
-# === 🔟 CALLBACK ===
+# === 🔟 CALLBACKS ===
+@app.callback(
+    Output("filtro-dataset", "value"),
+    Input("url", "search"),
+)
+def dataset_desde_url(search):
+    """?dataset=GENERAL_LTV_CLEAN elige el dataset al abrir el dashboard."""
+    valor = parse_qs((search or "").lstrip("?")).get("dataset", [None])[0]
+    return valor if valor in DATASETS else DATASET_DEFAULT
+
+
+@app.callback(
+    [
+        Output("filtro-fecha", "start_date"),
+        Output("filtro-fecha", "end_date"),
+        Output("filtro-affiliate", "options"),
+        Output("filtro-affiliate", "value"),
+        Output("filtro-source", "options"),
+        Output("filtro-source", "value"),
+        Output("filtro-country", "options"),
+        Output("filtro-country", "value"),
+        Output("info-dataset", "children"),
+    ],
+    Input("filtro-dataset", "value"),
+)
+def cambiar_dataset(tabla):
+    estado = registro.obtener(tabla)
+    df = estado["df"]
+    reporte = registro.reporte()
+
+    info = (
+        f"{len(df):,} filas · carga {estado['segundos_carga']:.2f}s · "
+        f"{estado['bytes'] / 1e6:.1f} MB "
+        f"({reporte['memoria_total_mb']:.1f}/{reporte['memoria_max_mb']:.0f} MB)"
+    )
+
+    return (
+        df["date"].min(),
+        df["date"].max(),
+        sorted(df["affiliate"].dropna().unique()),
+        None,
+        sorted(df["source"].dropna().unique()),
+        None,
+        sorted(df["country"].dropna().unique()),
+        None,
+        info,
+    )
+
+
 @app.callback(
     [
         Output("indicador-ftds", "children"),
@@ -251,36 +640,30 @@ app.layout = html.Div(
         Input("filtro-affiliate", "value"),
         Input("filtro-source", "value"),
         Input("filtro-country", "value"),
+        Input("filtro-dataset", "value"),
     ],
 )
-def actualizar_dashboard(start, end, affiliates, sources, countries):
+def actualizar_dashboard(start, end, affiliates, sources, countries, tabla):
+
+    estado = registro.obtener(tabla)
 
-    df_filtrado = df.copy()
+    # ======================================================
+    # 🔥 GENERAL LTV MENSUAL (FTD + RTN) / FTD
+    # (agregados mensuales; solo los meses de borde desde filas)
+    # ======================================================
+    df_filtrado = mensual_en_rango(estado, start, end)
 
-    if start and end:
-        df_filtrado = df_filtrado[
-            (df_filtrado["date"] >= pd.to_datetime(start)) &
-            (df_filtrado["date"] <= pd.to_datetime(end))
-        ]
     if affiliates:
         df_filtrado = df_filtrado[df_filtrado["affiliate"].isin(affiliates)]
     if sources:
         df_filtrado = df_filtrado[df_filtrado["source"].isin(sources)]
     if countries:
         df_filtrado = df_filtrado[df_filtrado["country"].isin(countries)]
-   
-    # ======================================================
-    # 🔥 GENERAL LTV MENSUAL (FTD + RTN) / FTD
-    # ======================================================
-    df_filtrado["month"] = df_filtrado["date"].dt.to_period("M")
 
     df_month = (
         df_filtrado
-        .groupby(["month", "country", "affiliate", "source", "team", "agent"], as_index=False)
-        .apply(lambda x: pd.Series({
-            "usd_total": x["usd_total"].sum(),
-            "count_ftd": (x["deposit_type"] == "Ftd").sum()
-        }))
+        .dropna(subset=DIMENSIONES)
+        .drop(columns=["usd_ftd", "usd_rtn"])
         .reset_index(drop=True)
     )
 
@@ -293,18 +676,14 @@ def actualizar_dashboard(start, end, affiliates, sources, countries):
     df_month.drop(columns=["month"], inplace=True)
 
     # === KPIs ===
-    total_ftds = (df_filtrado["deposit_type"].str.upper() == "FTD").sum()
+    total_ftds = df_filtrado["count_ftd"].sum()
     total_amount = df_filtrado["usd_total"].sum()
 
-    usd_ftd = df_filtrado.loc[
-        df_filtrado["deposit_type"].str.upper() == "FTD",
-        "usd_total"
-    ].sum()
+    # USD FTD / RTN solo si el dataset trae tipo de depósito
+    con_tipo = "deposit_type" in estado["df"].columns
+    usd_ftd = df_filtrado["usd_ftd"].sum()
 
-    usd_rtn = df_filtrado.loc[
-        df_filtrado["deposit_type"].str.upper() != "FTD",
-        "usd_total"
-    ].sum()
+    usd_rtn = df_filtrado["usd_rtn"].sum()
 
     general_ltv_total = total_amount / total_ftds if total_ftds > 0 else 0
 
@@ -329,12 +708,12 @@ def actualizar_dashboard(start, end, affiliates, sources, countries):
 
     indicador_usd_ftd = html.Div([
         html.H4("USD FTD", style={"color": "#D4AF37"}),
-        html.H2(f"${formato_km(usd_ftd)}", style={"color": "#FFF"})
+        html.H2(f"${formato_km(usd_ftd)}" if con_tipo else "N/A", style={"color": "#FFF"})
     ], style=card_style)
 
     indicador_usd_rtn = html.Div([
         html.H4("USD RTN", style={"color": "#D4AF37"}),
-        html.H2(f"${formato_km(usd_rtn)}", style={"color": "#FFF"})
+        html.H2(f"${formato_km(usd_rtn)}" if con_tipo else "N/A", style={"color": "#FFF"})
     ], style=card_style)
 
     indicador_ltv = html.Div([
@@ -1,4 +1,9 @@
+import hashlib
+import os
 import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
 import pandas as pd
 from conexion_mysql import crear_conexion
 
@@ -15,6 +20,19 @@ POSSIBLE_COUNTRIES = {
 # número de filas que Power Query salta:
 ROWS_TO_SKIP = 1113
 
+# procesos para la etapa por bloques de país (1 = serial)
+ETL_WORKERS = int(os.getenv("LTV_ETL_WORKERS", "1"))
+
+# columnas del Distinct del M-code (DATE, COUNTRY + AFFILIATE, TOTAL AMOUNT)
+DEDUP_KEY = ["date", "country_affiliate", "total_amount"]
+
+# tabla con el digest de cada partición (mes, país) de GENERAL_LTV_CLEAN
+DIGEST_TABLE = "GENERAL_LTV_CLEAN_DIGEST"
+
+# recrear GENERAL_LTV_CLEAN completa aunque los digests no cambien
+# (LTV_CARGA_COMPLETA=1 o --completa), p. ej. si la tabla se editó a mano
+CARGA_COMPLETA = os.getenv("LTV_CARGA_COMPLETA", "0") == "1" or "--completa" in sys.argv
+
 
 def leer_tabla_original():
     """Lee la tabla general_ltv desde Railway MySQL."""
@@ -59,11 +77,122 @@ def limpiar_monto(valor):
         return 0.0
 
 
-def limpiar_general_ltv(df_raw: pd.DataFrame) -> pd.DataFrame:
+def huella_filas(df: pd.DataFrame, columnas: list) -> pd.Series:
+    """
+    Hash de 64 bits por fila sobre `columnas`.
+    Los valores de texto se hashean vía str(), igual que el astype(str)
+    que usaba el Distinct (None y NaN siguen siendo distintos).
+    """
+    return pd.util.hash_pandas_object(df[columnas], index=False, categorize=False)
+
+
+def digest_particiones(df_final: pd.DataFrame) -> pd.DataFrame:
+    """
+    Digest por partición (mes, país) del resultado final.
+    Se ordenan los hashes de fila para que el digest no dependa del orden
+    de las filas dentro de la partición.
+    """
+    columnas = ["month", "country", "rows", "digest"]
+    if df_final.empty:
+        return pd.DataFrame(columns=columnas)
+
+    hashes = huella_filas(df_final, list(df_final.columns))
+    claves = pd.DataFrame({
+        "month": df_final["date"].dt.strftime("%Y-%m"),
+        "country": df_final["country"],
+        "hash": hashes,
+    })
+
+    registros = []
+    for (mes, pais), grupo in claves.groupby(["month", "country"], sort=True):
+        valores = grupo["hash"].sort_values().to_numpy()
+        digest = hashlib.blake2b(valores.tobytes(), digest_size=8).hexdigest()
+        registros.append((mes, pais, len(valores), digest))
+
+    return pd.DataFrame(registros, columns=columnas)
+
+
+def procesar_bloque(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Tipos finales de un bloque ya deduplicado y con país asignado:
+    TOTAL AMOUNT, FTD'S y GENERAL LTV como número, texto normalizado.
+    Cada fila es independiente, así que sirve igual para todo el frame
+    o para un bloque de países dentro de un proceso del pool.
+    """
+    df = df.copy()
+
+    # TOTAL AMOUNT y GENERAL LTV como número (similar a Power BI)
+    df["usd_total"] = df["total_amount"].apply(limpiar_monto)
+    df["count_ftd"] = pd.to_numeric(df["ftds"], errors="coerce").fillna(0).astype(float)
+
+    # general_ltv por fila: si viene en count_ftd/raw la usamos, si no la calculamos
+    if "general_ltv_raw" in df.columns:
+        df["general_ltv"] = pd.to_numeric(
+            df["general_ltv_raw"], errors="coerce"
+        ).fillna(0.0)
+    else:
+        df["general_ltv"] = 0.0
+
+    # recalcular cuando sea posible (como hace el M/Power BI)
+    df["general_ltv"] = df.apply(
+        lambda r: (r["usd_total"] / r["count_ftd"])
+        if r["count_ftd"] not in (0, None) else r["general_ltv"],
+        axis=1,
+    ).fillna(0.0)
+
+    # normalizar texto
+    df["country"] = (
+        df["country"].astype(str).str.strip().str.title()
+    )
+    df["affiliate"] = (
+        df["affiliate"].astype(str).str.strip().str.title()
+    )
+
+    return df
+
+
+def particionar_por_pais(df: pd.DataFrame, partes: int) -> list:
+    """
+    Parte el frame en a lo sumo `partes` trozos contiguos de tamaño parecido,
+    cortando solo donde cambia el país (los bloques del FillDown).
+    """
+    pais = df["country"].astype(str)
+    inicios = [0] + [
+        int(p) for p in (pais != pais.shift()).to_numpy().nonzero()[0] if p > 0
+    ]
+    objetivo = -(-len(df) // partes)
+
+    cortes = [0]
+    for inicio in inicios[1:]:
+        if inicio - cortes[-1] >= objetivo and len(cortes) < partes:
+            cortes.append(inicio)
+    cortes.append(len(df))
+
+    return [df.iloc[a:b] for a, b in zip(cortes[:-1], cortes[1:]) if b > a]
+
+
+def procesar_en_paralelo(df: pd.DataFrame, workers: int) -> pd.DataFrame:
+    """
+    Procesa los bloques de país en un ProcessPoolExecutor y los vuelve a unir
+    en el orden original, de modo que el resultado es idéntico al serial.
+    """
+    bloques = particionar_por_pais(df, workers)
+    print(f"⚙️ Procesando {len(bloques)} bloques de país con {workers} procesos ...")
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        resultados = list(pool.map(procesar_bloque, bloques))
+
+    return pd.concat(resultados)
+
+
+def limpiar_general_ltv(df_raw: pd.DataFrame, workers: int = None) -> pd.DataFrame:
     """
     Replica paso a paso el M-code del Advanced Editor
     y devuelve un DataFrame con columnas:
     date, country, affiliate, usd_total, count_ftd, general_ltv
+
+    Con workers > 1 (o LTV_ETL_WORKERS) los montos, FTD'S y LTV se calculan
+    por bloques de país en paralelo; la salida es la misma que la serial.
     """
 
     # ============================
@@ -152,45 +281,24 @@ def limpiar_general_ltv(df_raw: pd.DataFrame) -> pd.DataFrame:
     # ELIMINAR DUPLICADOS (RemoveDuplicates)
     # Distinct por: DATE, COUNTRY + AFFILIATE, TOTAL AMOUNT
     # ============================
-    df["date_str"] = df["date"].astype(str)
-    df["total_amount_str"] = df["total_amount"].astype(str)
-
-    df = df.drop_duplicates(
-        subset=["date_str", "country_affiliate", "total_amount_str"]
-    ).reset_index(drop=True)
+    huellas = huella_filas(df, DEDUP_KEY)
+    df = df[~huellas.duplicated()].reset_index(drop=True)
 
     # ============================
-    # TIPOS FINALES similar a Power BI:
-    # DATE como fecha, TOTAL AMOUNT y GENERAL LTV como número
+    # DATE como fecha (global: pandas infiere el formato del primer valor)
     # ============================
     df["date"] = pd.to_datetime(df["date"], errors="coerce")
     df = df[df["date"].notna()].copy()
 
-    df["usd_total"] = df["total_amount"].apply(limpiar_monto)
-    df["count_ftd"] = pd.to_numeric(df["ftds"], errors="coerce").fillna(0).astype(float)
-
-    # general_ltv por fila: si viene en count_ftd/raw la usamos, si no la calculamos
-    if "general_ltv_raw" in df.columns:
-        df["general_ltv"] = pd.to_numeric(
-            df["general_ltv_raw"], errors="coerce"
-        ).fillna(0.0)
+    # ============================
+    # MONTOS, FTD'S Y LTV POR BLOQUE DE PAÍS (serial o en paralelo)
+    # ============================
+    if workers is None:
+        workers = ETL_WORKERS
+    if workers > 1 and len(df) > 0:
+        df = procesar_en_paralelo(df, workers)
     else:
-        df["general_ltv"] = 0.0
-
-    # recalcular cuando sea posible (como hace el M/Power BI)
-    df["general_ltv"] = df.apply(
-        lambda r: (r["usd_total"] / r["count_ftd"])
-        if r["count_ftd"] not in (0, None) else r["general_ltv"],
-        axis=1,
-    ).fillna(0.0)
-
-    # normalizar texto
-    df["country"] = (
-        df["country"].astype(str).str.strip().str.title()
-    )
-    df["affiliate"] = (
-        df["affiliate"].astype(str).str.strip().str.title()
-    )
+        df = procesar_bloque(df)
 
     # dataframe final con columnas "limpias" para MySQL
     df_final = df[["date", "country", "affiliate", "usd_total", "count_ftd", "general_ltv"]].copy()
@@ -200,55 +308,151 @@ def limpiar_general_ltv(df_raw: pd.DataFrame) -> pd.DataFrame:
     return df_final
 
 
-def guardar_y_cargar_mysql(df_final: pd.DataFrame):
-    """Guarda CSV y sube la tabla GENERAL_LTV_CLEAN a Railway."""
+def filas_mysql(df: pd.DataFrame) -> list:
+    """Tuplas para el INSERT de GENERAL_LTV_CLEAN."""
+    return [
+        (
+            row["date"],
+            row["country"],
+            row["affiliate"],
+            float(row["usd_total"]),
+            int(row["count_ftd"]),
+            float(row["general_ltv"]),
+        )
+        for _, row in df.iterrows()
+    ]
+
+
+def leer_digests(conexion) -> pd.DataFrame:
+    """Digests de la última carga; None si la tabla aún no existe."""
+    try:
+        return pd.read_sql(f"SELECT month, country, digest FROM {DIGEST_TABLE}", conexion)
+    except Exception as e:
+        print(f"⚠️ No se pudieron leer los digests ({e}), se hará carga completa.")
+        return None
+
+
+def guardar_digests(cursor, digests: pd.DataFrame, borrar=()):
+    """Actualiza la tabla de digests (REPLACE por partición)."""
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {DIGEST_TABLE} (
+            month CHAR(7),
+            country VARCHAR(100),
+            `rows` INT,
+            digest CHAR(16),
+            PRIMARY KEY (month, country)
+        );
+    """)
+    if borrar:
+        cursor.executemany(
+            f"DELETE FROM {DIGEST_TABLE} WHERE month = %s AND country = %s",
+            list(borrar),
+        )
+    if not digests.empty:
+        cursor.executemany(
+            f"REPLACE INTO {DIGEST_TABLE} (month, country, `rows`, digest) VALUES (%s, %s, %s, %s)",
+            [
+                (r["month"], r["country"], int(r["rows"]), r["digest"])
+                for _, r in digests.iterrows()
+            ],
+        )
+
+
+def guardar_y_cargar_mysql(df_final: pd.DataFrame, completa: bool = False):
+    """
+    Guarda CSV y sube la tabla GENERAL_LTV_CLEAN a Railway.
+    Solo reescribe las particiones (mes, país) cuyo digest cambió desde la
+    última carga; con completa=True (o sin digests previos) la recrea entera.
+    """
     df_final.to_csv("GENERAL_LTV_preview.csv", index=False, encoding="utf-8-sig")
     print("💾 Vista previa guardada: GENERAL_LTV_preview.csv")
 
+    insert_sql = """
+        INSERT INTO GENERAL_LTV_CLEAN
+        (date, country, affiliate, usd_total, count_ftd, general_ltv)
+        VALUES (%s, %s, %s, %s, %s, %s)
+    """
+
     try:
         conexion = crear_conexion()
         if conexion is None:
             print("❌ No se pudo conectar a Railway para escribir la tabla.")
             return
 
+        digests = digest_particiones(df_final)
+        previos = None if completa else leer_digests(conexion)
         cursor = conexion.cursor()
 
-        cursor.execute("DROP TABLE IF EXISTS GENERAL_LTV_CLEAN;")
-        cursor.execute("""
-            CREATE TABLE GENERAL_LTV_CLEAN (
-                date DATETIME,
-                country VARCHAR(100),
-                affiliate VARCHAR(150),
-                usd_total DECIMAL(18,2),
-                count_ftd INT,
-                general_ltv DECIMAL(18,4)
-            );
-        """)
-        conexion.commit()
+        # ============================
+        # CARGA COMPLETA
+        # ============================
+        if previos is None:
+            cursor.execute("DROP TABLE IF EXISTS GENERAL_LTV_CLEAN;")
+            cursor.execute(f"DROP TABLE IF EXISTS {DIGEST_TABLE};")
+            cursor.execute("""
+                CREATE TABLE GENERAL_LTV_CLEAN (
+                    date DATETIME,
+                    country VARCHAR(100),
+                    affiliate VARCHAR(150),
+                    usd_total DECIMAL(18,2),
+                    count_ftd INT,
+                    general_ltv DECIMAL(18,4)
+                );
+            """)
+            conexion.commit()
+
+            cursor.executemany(insert_sql, filas_mysql(df_final))
+            guardar_digests(cursor, digests)
+            conexion.commit()
+            conexion.close()
+
+            print("✅ Tabla GENERAL_LTV_CLEAN creada y poblada correctamente en Railway.")
+            return
+
+        # ============================
+        # CARGA POR PARTICIONES (solo digests distintos)
+        # ============================
+        anteriores = {
+            (r["month"], r["country"]): r["digest"] for _, r in previos.iterrows()
+        }
+        nuevos = {
+            (r["month"], r["country"]): r["digest"] for _, r in digests.iterrows()
+        }
+        cambiadas = [k for k, d in nuevos.items() if anteriores.get(k) != d]
+        borradas = [k for k in anteriores if k not in nuevos]
+
+        if not cambiadas and not borradas:
+            conexion.close()
+            print("✅ GENERAL_LTV_CLEAN sin cambios, no se reescribe nada.")
+            return
 
-        insert_sql = """
-            INSERT INTO GENERAL_LTV_CLEAN
-            (date, country, affiliate, usd_total, count_ftd, general_ltv)
-            VALUES (%s, %s, %s, %s, %s, %s)
-        """
-
-        data = [
-            (
-                row["date"],
-                row["country"],
-                row["affiliate"],
-                float(row["usd_total"]),
-                int(row["count_ftd"]),
-                float(row["general_ltv"]),
+        meses = df_final["date"].dt.strftime("%Y-%m")
+        for mes, pais in cambiadas + borradas:
+            inicio = pd.Period(mes, freq="M").start_time
+            fin = (pd.Period(mes, freq="M") + 1).start_time
+            cursor.execute(
+                "DELETE FROM GENERAL_LTV_CLEAN WHERE country = %s AND date >= %s AND date < %s",
+                (pais, inicio.to_pydatetime(), fin.to_pydatetime()),
             )
-            for _, row in df_final.iterrows()
-        ]
 
-        cursor.executemany(insert_sql, data)
+        if cambiadas:
+            claves = pd.MultiIndex.from_arrays([meses, df_final["country"]])
+            mascara = claves.isin(cambiadas)
+            cursor.executemany(insert_sql, filas_mysql(df_final[mascara]))
+
+        reescribir = set(cambiadas)
+        guardar_digests(
+            cursor,
+            digests[[k in reescribir for k in zip(digests["month"], digests["country"])]],
+            borrar=borradas,
+        )
         conexion.commit()
         conexion.close()
 
-        print("✅ Tabla GENERAL_LTV_CLEAN creada y poblada correctamente en Railway.")
+        print(
+            f"✅ GENERAL_LTV_CLEAN actualizada: {len(cambiadas)} particiones reescritas, "
+            f"{len(borradas)} eliminadas, {len(nuevos) - len(cambiadas)} sin cambios."
+        )
     except Exception as e:
         print(f"⚠️ Error al crear GENERAL_LTV_CLEAN: {e}")
 
@@ -257,7 +461,7 @@ if __name__ == "__main__":
     _, df_raw = leer_tabla_original()
     if not df_raw.empty:
         df_final = limpiar_general_ltv(df_raw)
-        guardar_y_cargar_mysql(df_final)
+        guardar_y_cargar_mysql(df_final, completa=CARGA_COMPLETA)
 
         print("\nPrimeras filas del resultado final:")
         print(df_final.head(15))
@@ -0,0 +1,202 @@
+import os
+import random
+
+import pandas as pd
+import pytest
+
+import dashboard_LTV_app as app
+
+
+def datos_crudos(n=600, semilla=7, con_hora=True):
+    """Filas sintéticas con el formato de CMN_MASTER_MEX_CLEAN."""
+    r = random.Random(semilla)
+    filas = []
+    for i in range(n):
+        fecha = pd.Timestamp(2025, r.randint(1, 12), r.randint(1, 28))
+        if con_hora:
+            fecha += pd.Timedelta(hours=r.randint(0, 23), minutes=r.randint(0, 59))
+        filas.append({
+            "id": i + 1,
+            "date": fecha,
+            "country": r.choice(["mexico", "peru", None]),
+            "affiliate": r.choice(["alpha", "beta", "gamma"]),
+            "source": r.choice(["fb", "google", None]),
+            "team": r.choice(["t1", "t2"]),
+            "agent": r.choice(["a1", "a2", None]),
+            "usd": r.choice(["1.234,50", "100", "55.25", "abc"]),
+            "type": r.choice(["FTD", "rtn", None]),
+        })
+    return pd.DataFrame(filas)
+
+
+def reconstruccion(df_raw):
+    return app.agregar_mensual(app.limpiar_datos(df_raw))
+
+
+@pytest.mark.parametrize("particion", ["id", "date"])
+def test_fusionar_mensual_igual_a_reconstruccion(particion):
+    df_raw = datos_crudos()
+    if particion == "id":
+        viejas = df_raw["id"] <= 400
+    else:
+        viejas = df_raw["date"] < pd.Timestamp(2025, 9, 15)
+    a, b = df_raw[viejas], df_raw[~viejas]
+
+    df_mensual = app.fusionar_mensual(
+        app.agregar_mensual(app.limpiar_datos(a)),
+        app.limpiar_datos(pd.concat([a, b])),
+        app.limpiar_datos(b),
+    )
+
+    pd.testing.assert_frame_equal(df_mensual, reconstruccion(pd.concat([a, b])))
+
+
+def estado_con_sql_simulado(monkeypatch, tabla_sql):
+    """Carga el estado desde `tabla_sql` (lista mutable con un DataFrame)."""
+
+    def leer_sql(tabla, marca=None):
+        df = tabla_sql[0]
+        if marca is None:
+            return df
+        columna, valor = marca
+        if columna == "date":
+            return df[df[columna] >= valor]
+        return df[df[columna] > valor]
+
+    monkeypatch.setattr(app, "leer_sql", leer_sql)
+    monkeypatch.setattr(app, "RECARGA_SEGUNDOS", 0)
+    return app.cargar_estado("CMN_MASTER_MEX_CLEAN")
+
+
+@pytest.mark.parametrize("con_id", [True, False])
+@pytest.mark.parametrize("con_hora", [True, False])
+def test_refrescar_datos_igual_a_reconstruccion(monkeypatch, con_id, con_hora):
+    df_raw = datos_crudos(con_hora=con_hora).sort_values("date", kind="mergesort")
+    df_raw["id"] = range(1, len(df_raw) + 1)
+    if not con_id:
+        df_raw = df_raw.drop(columns="id")
+
+    # lo cargado al inicio termina a mitad de un día; el resto (mismo día
+    # incluido) se agrega después
+    corte = 450
+    tabla_sql = [df_raw.iloc[:corte]]
+    estado = estado_con_sql_simulado(monkeypatch, tabla_sql)
+
+    tabla_sql[0] = df_raw
+    anterior = estado
+    estado = app.refrescar_datos(estado)
+    assert estado is not None
+    assert len(anterior["df"]) == len(app.limpiar_datos(df_raw.iloc[:corte]))
+
+    completo = app.limpiar_datos(df_raw)
+    assert len(estado["df"]) == len(completo)
+    pd.testing.assert_frame_equal(estado["df_mensual"], app.agregar_mensual(completo))
+
+    # un segundo refresco sin filas nuevas no cambia nada
+    estado = app.refrescar_datos(estado) or estado
+    assert len(estado["df"]) == len(completo)
+    pd.testing.assert_frame_equal(estado["df_mensual"], app.agregar_mensual(completo))
+
+
+def test_sin_marca_con_fechas_de_texto(monkeypatch):
+    """Fechas dd/mm/YYYY en texto no sirven de marca (comparación alfabética)."""
+    df_raw = datos_crudos().drop(columns="id")
+    df_raw["date"] = df_raw["date"].dt.strftime("%d/%m/%Y")
+
+    estado = estado_con_sql_simulado(monkeypatch, [df_raw])
+    assert estado["marca"] is None
+    assert app.refrescar_datos(estado) is None
+
+
+def test_marca_con_columna_date(monkeypatch):
+    """Una columna DATE (objetos datetime.date) sí sirve de marca."""
+    df_raw = datos_crudos(con_hora=False).drop(columns="id")
+    df_raw["date"] = df_raw["date"].dt.date
+
+    estado = estado_con_sql_simulado(monkeypatch, [df_raw])
+    assert estado["marca"] == ("date", df_raw["date"].max())
+
+
+def test_carga_desde_csv_no_refresca(monkeypatch):
+    """Con el CSV local no hay marca: no se mezclan filas de MySQL."""
+    csv = os.path.join(os.path.dirname(os.path.abspath(__file__)), "GENERAL_LTV_preview.csv")
+    monkeypatch.setitem(app.DATASETS, "GENERAL_LTV_CLEAN", csv)
+    monkeypatch.setattr(app, "RECARGA_SEGUNDOS", 0)
+
+    monkeypatch.setattr(app, "leer_sql", lambda tabla, marca=None: None)
+    estado = app.cargar_estado("GENERAL_LTV_CLEAN")
+    assert estado["marca"] is None
+    filas = len(estado["df"])
+
+    nuevas = pd.DataFrame({
+        "date": [pd.Timestamp(2025, 12, 1, 10)],
+        "country": ["Peru"],
+        "affiliate": ["Nuevo"],
+        "usd_total": ["100"],
+        "count_ftd": ["1"],
+    })
+    monkeypatch.setattr(app, "leer_sql", lambda tabla, marca=None: nuevas)
+    assert app.refrescar_datos(estado) is None
+    assert app.refrescar_datos(estado) is None
+    assert len(estado["df"]) == filas
+
+
+# ============================
+# REGISTRO DE DATASETS
+# ============================
+@pytest.fixture
+def registro(monkeypatch):
+    """Registro con tres tablas falsas de 100 bytes cada una."""
+
+    def cargar_estado(tabla):
+        return {
+            "tabla": tabla,
+            "df": pd.DataFrame(),
+            "df_mensual": pd.DataFrame(),
+            "marca": None,
+            "ultima_revision": 0,
+            "segundos_carga": 0.0,
+        }
+
+    monkeypatch.setattr(app, "cargar_estado", cargar_estado)
+    monkeypatch.setattr(app, "memoria_estado", lambda estado: 100)
+    return app.RegistroDatasets(["A", "B", "C"], memoria_max=250)
+
+
+def test_registro_expulsa_el_menos_usado(registro):
+    registro.obtener("A")
+    registro.obtener("B")
+    registro.obtener("C")
+    assert list(registro.cargados) == ["B", "C"]
+
+    registro.obtener("B")
+    registro.obtener("A")
+    assert list(registro.cargados) == ["B", "A"]
+
+
+def test_registro_no_expulsa_el_dataset_pedido(registro):
+    registro.memoria_max = 50
+
+    assert registro.obtener("A")["tabla"] == "A"
+    assert list(registro.cargados) == ["A"]
+
+    assert registro.obtener("B")["tabla"] == "B"
+    assert list(registro.cargados) == ["B"]
+
+
+def test_reporte_datasets(monkeypatch, registro):
+    monkeypatch.setattr(app, "registro", registro)
+    registro.obtener("B")
+
+    with app.server.test_client() as cliente:
+        reporte = cliente.get("/datasets").get_json()
+
+    assert reporte["memoria_total_mb"] == round(100 / 1e6, 1)
+    assert [d["tabla"] for d in reporte["datasets"]] == ["A", "B", "C"]
+    assert [d["cargado"] for d in reporte["datasets"]] == [False, True, False]
+
+
+def test_dataset_desde_url():
+    assert app.dataset_desde_url("?dataset=GENERAL_LTV_CLEAN") == "GENERAL_LTV_CLEAN"
+    assert app.dataset_desde_url("?dataset=NO_EXISTE") == app.DATASET_DEFAULT
+    assert app.dataset_desde_url(None) == app.DATASET_DEFAULT
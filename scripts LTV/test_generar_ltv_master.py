@@ -0,0 +1,183 @@
+import random
+from decimal import Decimal
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import generar_ltv_master as etl
+
+
+def general_ltv_crudo(n=3000, semilla=5):
+    """Filas sintéticas con el formato de la tabla general_ltv."""
+    r = random.Random(semilla)
+    paises = sorted(etl.POSSIBLE_COUNTRIES)
+    filas = []
+    for i in range(n):
+        if r.random() < 0.05:
+            pais = r.choice(paises)
+        else:
+            pais = r.choice(["diamond", "roik", "alpha", "Total General", ""])
+        filas.append({
+            "id": i,
+            "pais": pais,
+            "fecha": r.choice(["2025-10-%02d" % r.randint(1, 31), "2025-09-%02d" % r.randint(1, 30), "bad"]),
+            "afiliado": r.choice(["1.234,56", "200", "9,195", "$ 1,000.5", None, "abc", "12,50"]),
+            "usd_total": r.choice(["3", "0", None, "x", "12"]),
+            "count_ftd": r.choice(["100", "2.5", None]),
+            "fecha_registro": "x",
+        })
+    return pd.DataFrame(filas)
+
+
+# ============================
+# PROCESAMIENTO EN PARALELO
+# ============================
+def test_paralelo_igual_a_serial():
+    df_raw = general_ltv_crudo(n=6000)
+
+    serial = etl.limpiar_general_ltv(df_raw, workers=1)
+    paralelo = etl.limpiar_general_ltv(df_raw, workers=3)
+
+    pd.testing.assert_frame_equal(paralelo, serial, check_exact=True)
+    assert paralelo.to_csv(index=False) == serial.to_csv(index=False)
+
+
+def revisar_particion(df, partes):
+    bloques = etl.particionar_por_pais(df, partes)
+    assert 1 <= len(bloques) <= partes
+    pd.testing.assert_frame_equal(pd.concat(bloques), df)
+
+    # cada corte cae donde cambia el país
+    pais = df["country"].astype(str).tolist()
+    inicio = 0
+    for bloque in bloques[:-1]:
+        inicio += len(bloque)
+        assert pais[inicio] != pais[inicio - 1]
+    return bloques
+
+
+def test_particion_un_solo_pais():
+    df = pd.DataFrame({"country": ["Peru"] * 10, "x": range(10)})
+    assert len(revisar_particion(df, 4)) == 1
+
+
+def test_particion_mas_workers_que_bloques():
+    df = pd.DataFrame({"country": ["Peru"] * 5 + ["Mexico"] * 5, "x": range(10)})
+    assert len(revisar_particion(df, 8)) == 2
+
+
+def test_particion_pais_nulo_antes_del_primer_pais():
+    df = pd.DataFrame({
+        "country": [pd.NA] * 4 + ["Peru"] * 3 + ["Mexico"] * 3,
+        "x": range(10),
+    })
+    bloques = revisar_particion(df, 5)
+    assert len(bloques) == 3
+    assert bloques[0]["country"].isna().all()
+
+
+# ============================
+# DEDUP POR HUELLA
+# ============================
+def test_huella_igual_a_distinct_por_texto():
+    valores = ["10", 10, Decimal("10"), Decimal("10.50"), "10.50", 10.5, None, np.nan, "None", "nan", ""]
+    r = random.Random(3)
+    df = pd.DataFrame({
+        "date": [r.choice(["2025-10-01", None, np.nan, pd.Timestamp(2025, 10, 1)]) for _ in range(400)],
+        # limpiar_general_ltv ya pasó COUNTRY + AFFILIATE a texto antes del Distinct
+        "country_affiliate": [r.choice(["Roik", "roik", "None", "nan"]) for _ in range(400)],
+        "total_amount": [r.choice(valores) for _ in range(400)],
+    })
+
+    # Distinct original: columnas de texto + drop_duplicates
+    texto = df.assign(
+        date_str=df["date"].astype(str),
+        total_amount_str=df["total_amount"].astype(str),
+    )
+    esperado = texto.drop_duplicates(subset=["date_str", "country_affiliate", "total_amount_str"]).index
+
+    obtenido = df[~etl.huella_filas(df, etl.DEDUP_KEY).duplicated()].index
+    assert list(obtenido) == list(esperado)
+
+
+# ============================
+# CARGA POR PARTICIONES
+# ============================
+class CursorFalso:
+    def __init__(self):
+        self.sentencias = []
+
+    def execute(self, sql, params=None):
+        self.sentencias.append((sql.split()[0], params))
+
+    def executemany(self, sql, filas):
+        self.sentencias.append((sql.split()[0], list(filas)))
+
+
+class ConexionFalsa:
+    def __init__(self):
+        self.cursor_falso = CursorFalso()
+
+    def cursor(self):
+        return self.cursor_falso
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def carga(monkeypatch, tmp_path):
+    """Corre guardar_y_cargar_mysql con digests previos dados y devuelve las sentencias."""
+    monkeypatch.chdir(tmp_path)
+
+    def correr(df_final, previos):
+        conexion = ConexionFalsa()
+        monkeypatch.setattr(etl, "crear_conexion", lambda: conexion)
+        monkeypatch.setattr(etl, "leer_digests", lambda c: previos)
+        etl.guardar_y_cargar_mysql(df_final)
+        return conexion.cursor_falso.sentencias
+
+    return correr
+
+
+@pytest.fixture
+def df_final():
+    return etl.limpiar_general_ltv(general_ltv_crudo(), workers=1)
+
+
+def test_carga_sin_cambios_no_escribe(carga, df_final):
+    previos = etl.digest_particiones(df_final)[["month", "country", "digest"]]
+    assert carga(df_final, previos) == []
+
+
+def test_carga_reescribe_solo_particion_cambiada(carga, df_final):
+    previos = etl.digest_particiones(df_final)[["month", "country", "digest"]]
+
+    cambiado = df_final.copy()
+    cambiado.loc[0, "usd_total"] += 1
+    mes, pais = cambiado.loc[0, "date"].strftime("%Y-%m"), cambiado.loc[0, "country"]
+    en_particion = (cambiado["date"].dt.strftime("%Y-%m") == mes) & (cambiado["country"] == pais)
+
+    sentencias = carga(cambiado, previos)
+
+    deletes = [p for s, p in sentencias if s == "DELETE" and isinstance(p, tuple)]
+    assert deletes == [(pais, pd.Timestamp(mes + "-01").to_pydatetime(), (pd.Period(mes) + 1).start_time.to_pydatetime())]
+    inserts = [p for s, p in sentencias if s == "INSERT"]
+    assert len(inserts) == 1 and len(inserts[0]) == en_particion.sum()
+    replaces = [p for s, p in sentencias if s == "REPLACE"]
+    assert [(m, c) for m, c, _, _ in replaces[0]] == [(mes, pais)]
+
+
+def test_carga_borra_particion_eliminada(carga, df_final):
+    previos = etl.digest_particiones(df_final)[["month", "country", "digest"]]
+    previos.loc[len(previos)] = ["2020-01", "Peru", "0000000000000000"]
+
+    sentencias = carga(df_final, previos)
+
+    assert ("DELETE", ("Peru", pd.Timestamp(2020, 1, 1).to_pydatetime(), pd.Timestamp(2020, 2, 1).to_pydatetime())) in sentencias
+    assert ("DELETE", [("2020-01", "Peru")]) in sentencias
+    assert not [s for s, _ in sentencias if s in ("INSERT", "REPLACE")]